@@ -0,0 +1,21 @@
+import 'package:smython/optimizer.dart';
+import 'package:smython/smython.dart';
+
+/// Compares the time needed to compute `fib(20)` with and without compiling
+/// expressions to bytecode. Memoization is switched off, because it would
+/// reduce the exponential number of calls to a linear one.
+void main() {
+  const source = 'def fib(n):\n'
+      '    if n <= 2: return 1\n'
+      '    return fib(n - 1) + fib(n - 2)\n'
+      'fib(20)\n';
+  final system = Smython();
+  for (final bytecode in [false, true, false, true]) {
+    final suite = Optimizer(memoization: false, bytecode: bytecode).optimizeSuite(parse(source));
+    final watch = Stopwatch()..start();
+    for (var i = 0; i < 10; i++) {
+      suite.evaluate(Frame(null, {}, {}, system.builtins, system));
+    }
+    print('bytecode: $bytecode, ${watch.elapsedMilliseconds} ms');
+  }
+}
@@ -1,5 +1,7 @@
+import 'dart:io';
+
 import 'package:smython/test_runner.dart';
 
 void main() {
-  run('parser_tests.py');
+  if (!run('parser_tests.py')) exitCode = 1;
 }
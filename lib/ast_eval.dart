@@ -10,6 +10,8 @@ library ast_eval;
 
 import 'package:smython/smython.dart';
 
+import 'bytecode.dart';
+
 // -------- Suite --------
 
 /// A suite of [Stmt]s.
@@ -96,6 +98,40 @@ final class WhileStmt extends Stmt {
   }
 }
 
+/// `while name < stop: suite; name += 1 else: elseSuite`
+///
+/// Created by the optimizer for a [WhileStmt] which counts [name] up to an
+/// integer literal [stop], incrementing it only as the last statement of
+/// its body. [suite] is the body without that increment and must neither
+/// assign [name], nor call functions, nor `break` or `continue`.
+final class RangeLoopStmt extends Stmt {
+  const RangeLoopStmt(this.name, this.stop, this.suite, this.elseSuite, this.fallback);
+  final SmyString name;
+  final int stop;
+  final Suite suite;
+  final Suite elseSuite;
+
+  /// The original loop, evaluated if [name] isn't bound to an integer.
+  final WhileStmt fallback;
+
+  /// Evaluates [suite] once for each integer from the current value of
+  /// [name] up to but not including [stop], binding [name] to that integer
+  /// without evaluating the loop's condition and increment. Then, [name] is
+  /// bound to [stop] if the loop was entered and [elseSuite] is evaluated.
+  @override
+  SmyValue evaluate(Frame f) {
+    final start = f.lookup(name);
+    if (start is! SmyNum || start.value is! int) return fallback.evaluate(f);
+    final first = start.value as int;
+    for (var i = first; i < stop; i++) {
+      f.set(name, SmyNum(i));
+      suite.evaluate(f);
+    }
+    if (first < stop) f.set(name, SmyNum(stop));
+    return elseSuite.evaluate(f);
+  }
+}
+
 /// `for target, ... in test, ...: suite else: suite`
 final class ForStmt extends Stmt {
   const ForStmt(this.target, this.items, this.suite, this.elseSuite);
@@ -193,12 +229,16 @@ final class ExceptClause {
 
 /// `def name(param=def, ...): suite`
 final class DefStmt extends Stmt {
-  const DefStmt(this.name, this.params, this.defs, this.suite);
+  const DefStmt(this.name, this.params, this.defs, this.suite, {this.pure = false});
   final String name;
   final List<String> params;
   final List<Expr> defs;
   final Suite suite;
 
+  /// Whether the function's result depends only on its arguments and
+  /// calling it has no side effects, so that results can be memoized.
+  final bool pure;
+
   /// Defines a new function called [name] that expects [params] and uses
   /// [defs] to compute the arguments if they aren't given. Hence, [params]
   /// and [defs] should have the same length. Use [suite] as the function's
@@ -206,7 +246,7 @@ final class DefStmt extends Stmt {
   @override
   SmyValue evaluate(Frame f) {
     final n = SmyString.intern(name);
-    return f.locals[n] = SmyFunc(f, n, params, defs, suite);
+    return f.locals[n] = SmyFunc(f, n, params, defs, suite, pure: pure);
   }
 }
 
@@ -230,7 +270,7 @@ final class ClassStmt extends Stmt {
     final n = SmyString.intern(name);
     final cls = SmyClass(n, superclass != SmyValue.none ? superclass as SmyClass : null);
     f.locals[n] = cls;
-    suite.evaluate(Frame(f, cls.methods, f.globals, f.builtins, f.system));
+    cls.define(f, suite.evaluate);
     return SmyValue.none;
   }
 }
@@ -468,6 +508,11 @@ sealed class Expr {
 
   static SmyValue or(SmyValue l, SmyValue r) => SmyNum(l.intValue | r.intValue);
   static SmyValue and(SmyValue l, SmyValue r) => SmyNum(l.intValue & r.intValue);
+
+  // default unary operations
+  static SmyValue not(SmyValue v) => SmyBool(!v.boolValue);
+  static SmyValue neg(SmyValue v) => SmyNum(-v.numValue);
+  static SmyValue invert(SmyValue v) => SmyNum(~v.intValue);
 }
 
 /// _expr_ `if` _test_ `else` _test_
@@ -512,15 +557,11 @@ final class NotExpr extends Expr {
   final Expr expr;
 
   @override
-  SmyValue evaluate(Frame f) => SmyBool(!expr.evaluate(f).boolValue);
+  SmyValue evaluate(Frame f) => Expr.not(expr.evaluate(f));
 }
 
-/// `expr < expr`, `expr < expr < expr`
-final class CompOp {
-  CompOp(this.op, this.right);
-  final bool Function(SmyValue, SmyValue) op;
-  final Expr right;
-
+/// The comparison operations of a [Comparison].
+abstract final class CompOp {
   static bool eq(SmyValue l, SmyValue r) => l == r;
   static bool ne(SmyValue l, SmyValue r) => !eq(l, r);
   static bool lt(SmyValue l, SmyValue r) => l.numValue < r.numValue;
@@ -538,20 +579,35 @@ final class CompOp {
   static bool notis(SmyValue l, SmyValue r) => !is_(l, r);
 }
 
+/// `expr < expr`, `expr < expr < expr`
+///
+/// The operations and their right operands are stored in two parallel
+/// lists [ops] and [rights] of the same length instead of a list of
+/// pairs, saving one object per operation.
 final class Comparison extends Expr {
-  Comparison(this.left, this.ops);
+  Comparison(this.left, this.ops, this.rights);
   final Expr left;
-  final List<CompOp> ops;
-
-  @override
-  SmyValue evaluate(Frame f) {
-    var l = left.evaluate(f);
-    for (final op in ops) {
-      final r = op.right.evaluate(f);
-      if (!op.op(l, r)) return SmyBool(false);
-      l = r;
+  final List<bool Function(SmyValue, SmyValue)> ops;
+  final List<Expr> rights;
+
+  @override
+  SmyValue evaluate(Frame f) => chain(left.evaluate(f), ops, (i) => rights[i].evaluate(f));
+
+  /// Compares [left] with the first right operand using the first of [ops],
+  /// then that operand with the second one using the second operation, and
+  /// so on. Stops at the first failed comparison, so that the remaining
+  /// right operands, which are computed by [right], aren't computed at all.
+  static SmyValue chain(
+    SmyValue left,
+    List<bool Function(SmyValue, SmyValue)> ops,
+    SmyValue Function(int index) right,
+  ) {
+    for (var i = 0; i < ops.length; i++) {
+      final r = right(i);
+      if (!ops[i](left, r)) return SmyValue.falseValue;
+      left = r;
     }
-    return SmyBool(true);
+    return SmyValue.trueValue;
   }
 }
 
@@ -659,7 +715,7 @@ final class NegExpr extends Expr {
   final Expr expr;
 
   @override
-  SmyValue evaluate(Frame f) => SmyNum(-expr.evaluate(f).numValue);
+  SmyValue evaluate(Frame f) => Expr.neg(expr.evaluate(f));
 }
 
 /// `~expr`
@@ -668,7 +724,7 @@ final class InvertExpr extends Expr {
   final Expr expr;
 
   @override
-  SmyValue evaluate(Frame f) => SmyNum(~expr.evaluate(f).intValue);
+  SmyValue evaluate(Frame f) => Expr.invert(expr.evaluate(f));
 }
 
 /// `expr(args, ...)`
@@ -680,7 +736,7 @@ final class CallExpr extends Expr {
   @override
   SmyValue evaluate(Frame f) {
     // print('call: $this');
-    return expr.evaluate(f).call(f, args.map<SmyValue>((arg) => arg.evaluate(f)).toList());
+    return expr.evaluate(f).call(f, [for (final arg in args) arg.evaluate(f)]);
   }
 
   @override
@@ -693,9 +749,10 @@ final class IndexExpr extends Expr {
   final Expr left, right;
 
   @override
-  SmyValue evaluate(Frame f) {
-    final value = left.evaluate(f);
-    final index = right.evaluate(f);
+  SmyValue evaluate(Frame f) => subscript(left.evaluate(f), right.evaluate(f));
+
+  /// Returns the element of [value] at [index] which might also be a slice.
+  static SmyValue subscript(SmyValue value, SmyValue index) {
     final length = value.length;
     if (value is SmyDict) {
       return value.values[index] ?? SmyValue.none;
@@ -750,13 +807,14 @@ final class IndexExpr extends Expr {
 
 /// `expr.NAME`
 final class AttrExpr extends Expr {
-  const AttrExpr(this.expr, this.name);
+  AttrExpr(this.expr, this.name) : _cache = AttrCache(name);
   final Expr expr;
   final String name;
+  final AttrCache _cache;
 
   @override
   SmyValue evaluate(Frame f) {
-    return expr.evaluate(f).getAttr(name);
+    return _cache.getAttr(expr.evaluate(f));
   }
 
   @override
@@ -789,6 +847,21 @@ final class VarExpr extends Expr {
   String toString() => name.stringValue;
 }
 
+/// An expression compiled to bytecode, see [Code].
+final class CodeExpr extends Expr {
+  const CodeExpr(this.code, this.expr);
+  final Code code;
+
+  /// The original expression which has been compiled to [code].
+  final Expr expr;
+
+  @override
+  SmyValue evaluate(Frame f) => code.run(f);
+
+  @override
+  String toString() => expr.toString();
+}
+
 /// `None`, `True`, `False`, `NUMBER`, `STRING`
 final class LitExpr extends Expr {
   const LitExpr(this.value);
@@ -844,10 +917,13 @@ final class DictExpr extends Expr {
   final List<Expr> exprs;
 
   @override
-  SmyValue evaluate(Frame f) {
+  SmyValue evaluate(Frame f) => build([for (final expr in exprs) expr.evaluate(f)]);
+
+  /// Returns a new dict from alternating keys and [values].
+  static SmyDict build(List<SmyValue> values) {
     final dict = <SmyValue, SmyValue>{};
-    for (var i = 0; i < exprs.length; i += 2) {
-      dict[exprs[i].evaluate(f)] = exprs[i + 1].evaluate(f);
+    for (var i = 0; i < values.length; i += 2) {
+      dict[values[i]] = values[i + 1];
     }
     return SmyDict(dict);
   }
@@ -0,0 +1,376 @@
+/// Compiles Smython expressions to bytecode for a simple stack machine.
+///
+/// Instead of recursively evaluating a tree of [Expr] nodes, [Code] runs
+/// a flat list of instructions in a single loop. Each instruction is an
+/// opcode followed by up to two operands which are either jump targets or
+/// indices into one of the typed tables of [Code] like [Code.names], so
+/// that running an instruction needs no type casts. The stack's size is
+/// computed at compile time.
+///
+/// Example: `fib(n - 1)` is compiled to
+/// ```
+/// LOAD_NAME fib
+/// LOAD_NAME n
+/// LOAD_CONST 1
+/// BINARY sub
+/// CALL 1
+/// ```
+library bytecode;
+
+import 'dart:typed_data';
+
+import 'ast_eval.dart';
+import 'smython.dart';
+
+// -------- Opcodes --------
+
+/// `LOAD_CONST k`: pushes `values[k]`.
+const _loadConst = 0;
+
+/// `LOAD_NAME k`: pushes the value bound to the name `names[k]`.
+const _loadName = 1;
+
+/// `GET_ATTR k`: replaces the top of stack with its attribute, looked up
+/// by the [AttrCache] `caches[k]`.
+const _getAttr = 2;
+
+/// `INDEX`: pops index and value, pushes the value's element at index.
+const _index = 3;
+
+/// `CALL n`: pops `n` arguments and the callee, pushes the call's result.
+const _call = 4;
+
+/// `BINARY k`: pops two values, pushes the result of applying `binaries[k]`.
+const _binary = 5;
+
+/// `UNARY k`: replaces the top of stack with the result of `unaries[k]`.
+const _unary = 6;
+
+/// `COMPARE k`: pops two values, pushes the result of comparing them
+/// using `compares[k]`.
+const _compare = 7;
+
+/// `JUMP t`: continues at `t`.
+const _jump = 8;
+
+/// `JUMP_IF_FALSE t`: pops a value and continues at `t` if it is false.
+const _jumpIfFalse = 9;
+
+/// `AND_JUMP t`: pops a value and if it is false, pushes `False` and
+/// continues at `t`.
+const _andJump = 10;
+
+/// `OR_JUMP t`: pops a value and if it is true, pushes `True` and
+/// continues at `t`.
+const _orJump = 11;
+
+/// `TO_BOOL`: replaces the top of stack with its boolean value.
+const _toBool = 12;
+
+/// `BUILD_TUPLE n`: pops `n` values, pushes them as tuple.
+const _buildTuple = 13;
+
+/// `BUILD_LIST n`: pops `n` values, pushes them as list.
+const _buildList = 14;
+
+/// `BUILD_DICT n`: pops `n` alternating keys and values, pushes a dict.
+const _buildDict = 15;
+
+/// `BUILD_SET n`: pops `n` values, pushes them as set.
+const _buildSet = 16;
+
+/// `EVAL k`: pushes the result of evaluating the [Expr] `exprs[k]`. Used
+/// for chained comparisons like `a < b < c`, which evaluate their operands
+/// only as long as the comparisons hold, see [Comparison.chain].
+const _eval = 17;
+
+// -------- Code --------
+
+/// A compiled expression.
+final class Code {
+  Code._(
+    this.code,
+    this.stackSize,
+    this.values,
+    this.names,
+    this.caches,
+    this.binaries,
+    this.unaries,
+    this.compares,
+    this.exprs,
+  );
+
+  /// Compiles [expr] to bytecode.
+  factory Code.compile(Expr expr) => (_Compiler()..compile(expr)).build();
+
+  /// The instructions.
+  final Uint32List code;
+
+  /// The maximum number of values on the stack while running [code].
+  final int stackSize;
+
+  /// The values pushed by `LOAD_CONST`.
+  final List<SmyValue> values;
+
+  /// The names looked up by `LOAD_NAME`.
+  final List<SmyString> names;
+
+  /// The caches used by `GET_ATTR`.
+  final List<AttrCache> caches;
+
+  /// The operations applied by `BINARY`.
+  final List<SmyValue Function(SmyValue, SmyValue)> binaries;
+
+  /// The operations applied by `UNARY`.
+  final List<SmyValue Function(SmyValue)> unaries;
+
+  /// The operations applied by `COMPARE`.
+  final List<bool Function(SmyValue, SmyValue)> compares;
+
+  /// The expressions evaluated by `EVAL`.
+  final List<Expr> exprs;
+
+  /// Runs the instructions in the context of [f] and returns the value
+  /// left on the stack, which is the value of the compiled expression.
+  SmyValue run(Frame f) {
+    final code = this.code;
+    final stack = List<SmyValue>.filled(stackSize, SmyValue.none);
+    var sp = 0;
+    var pc = 0;
+    while (pc < code.length) {
+      switch (code[pc++]) {
+        case _loadConst:
+          stack[sp++] = values[code[pc++]];
+        case _loadName:
+          stack[sp++] = f.lookup(names[code[pc++]]);
+        case _getAttr:
+          stack[sp - 1] = caches[code[pc++]].getAttr(stack[sp - 1]);
+        case _index:
+          final index = stack[--sp];
+          stack[sp - 1] = IndexExpr.subscript(stack[sp - 1], index);
+        case _call:
+          final n = code[pc++];
+          sp -= n;
+          final args = _take(stack, sp, n);
+          stack[sp - 1] = stack[sp - 1].call(f, args);
+        case _binary:
+          final right = stack[--sp];
+          stack[sp - 1] = binaries[code[pc++]](stack[sp - 1], right);
+        case _unary:
+          stack[sp - 1] = unaries[code[pc++]](stack[sp - 1]);
+        case _compare:
+          final right = stack[--sp];
+          stack[sp - 1] = SmyBool(compares[code[pc++]](stack[sp - 1], right));
+        case _jump:
+          pc = code[pc];
+        case _jumpIfFalse:
+          final target = code[pc++];
+          if (!stack[--sp].boolValue) pc = target;
+        case _andJump:
+          final target = code[pc++];
+          if (!stack[--sp].boolValue) {
+            stack[sp++] = SmyValue.falseValue;
+            pc = target;
+          }
+        case _orJump:
+          final target = code[pc++];
+          if (stack[--sp].boolValue) {
+            stack[sp++] = SmyValue.trueValue;
+            pc = target;
+          }
+        case _toBool:
+          stack[sp - 1] = SmyBool(stack[sp - 1].boolValue);
+        case _buildTuple:
+          final n = code[pc++];
+          sp -= n;
+          final items = _take(stack, sp, n);
+          stack[sp++] = SmyTuple(items);
+        case _buildList:
+          final n = code[pc++];
+          sp -= n;
+          final items = _take(stack, sp, n);
+          stack[sp++] = SmyList(items);
+        case _buildDict:
+          final n = code[pc++];
+          sp -= n;
+          final items = _take(stack, sp, n);
+          stack[sp++] = DictExpr.build(items);
+        case _buildSet:
+          final n = code[pc++];
+          sp -= n;
+          final items = _take(stack, sp, n);
+          stack[sp++] = SmySet(items.toSet());
+        case _eval:
+          stack[sp++] = exprs[code[pc++]].evaluate(f);
+        default:
+          throw StateError('invalid opcode ${code[pc - 1]}');
+      }
+    }
+    return stack[0];
+  }
+
+  /// Returns the [n] values of [stack] starting at [start] as a new
+  /// growable list, in the order they were pushed.
+  static List<SmyValue> _take(List<SmyValue> stack, int start, int n) {
+    return List.of(stack.getRange(start, start + n));
+  }
+}
+
+// -------- Compiler --------
+
+/// Translates an [Expr] into instructions for [Code].
+final class _Compiler {
+  final _code = <int>[];
+  final _values = <SmyValue>[];
+  final _names = <SmyString>[];
+  final _caches = <AttrCache>[];
+  final _binaries = <SmyValue Function(SmyValue, SmyValue)>[];
+  final _unaries = <SmyValue Function(SmyValue)>[];
+  final _compares = <bool Function(SmyValue, SmyValue)>[];
+  final _exprs = <Expr>[];
+
+  /// The number of values on the stack after running the instructions
+  /// emitted so far.
+  var _depth = 0;
+
+  /// The maximum of [_depth] so far.
+  var _maxDepth = 0;
+
+  Code build() => Code._(
+        Uint32List.fromList(_code),
+        _maxDepth,
+        List.unmodifiable(_values),
+        List.unmodifiable(_names),
+        List.unmodifiable(_caches),
+        List.unmodifiable(_binaries),
+        List.unmodifiable(_unaries),
+        List.unmodifiable(_compares),
+        List.unmodifiable(_exprs),
+      );
+
+  /// Emits [opcode] followed by its [operands]. The instruction changes the
+  /// number of values on the stack by [effect].
+  void _emit(int opcode, int effect, [List<int> operands = const []]) {
+    _code.add(opcode);
+    _code.addAll(operands);
+    _depth += effect;
+    if (_depth > _maxDepth) _maxDepth = _depth;
+  }
+
+  /// Emits a jump [opcode] with an unknown target and returns the address
+  /// of that target, to be patched later with [_patch].
+  int _emitJump(int opcode, int effect) {
+    _emit(opcode, effect);
+    _code.add(-1);
+    return _code.length - 1;
+  }
+
+  /// Makes the jump with the target address [at] jump to the next
+  /// instruction emitted.
+  void _patch(int at) => _code[at] = _code.length;
+
+  /// Returns the index of [value] in [table], adding it if needed.
+  static int _indexOf<T extends Object>(List<T> table, T value) {
+    final index = table.indexWhere((v) => identical(v, value));
+    if (index != -1) return index;
+    table.add(value);
+    return table.length - 1;
+  }
+
+  void _compileBinary(Expr left, Expr right, SmyValue Function(SmyValue, SmyValue) op) {
+    compile(left);
+    compile(right);
+    _emit(_binary, -1, [_indexOf(_binaries, op)]);
+  }
+
+  void _compileUnary(Expr expr, SmyValue Function(SmyValue) op) {
+    compile(expr);
+    _emit(_unary, 0, [_indexOf(_unaries, op)]);
+  }
+
+  void _compileBuild(int opcode, List<Expr> exprs) {
+    exprs.forEach(compile);
+    _emit(opcode, 1 - exprs.length, [exprs.length]);
+  }
+
+  /// Emits instructions which leave the value of [node] on the stack.
+  void compile(Expr node) {
+    switch (node) {
+      case LitExpr(:final value):
+        _emit(_loadConst, 1, [_indexOf(_values, value)]);
+      case VarExpr(:final name):
+        _emit(_loadName, 1, [_indexOf(_names, name)]);
+      case AttrExpr(:final expr, :final name):
+        compile(expr);
+        _emit(_getAttr, 0, [_indexOf(_caches, AttrCache(name))]);
+      case IndexExpr(:final left, :final right):
+        compile(left);
+        compile(right);
+        _emit(_index, -1);
+      case CallExpr(:final expr, :final args):
+        compile(expr);
+        args.forEach(compile);
+        _emit(_call, -args.length, [args.length]);
+      case CondExpr(:final test, :final thenExpr, :final elseExpr):
+        compile(test);
+        final toElse = _emitJump(_jumpIfFalse, -1);
+        compile(thenExpr);
+        final toEnd = _emitJump(_jump, 0);
+        _patch(toElse);
+        _depth--; // the value of thenExpr isn't on the stack here
+        compile(elseExpr);
+        _patch(toEnd);
+      case OrExpr(:final left, :final right):
+        compile(left);
+        final toEnd = _emitJump(_orJump, -1);
+        compile(right);
+        _emit(_toBool, 0);
+        _patch(toEnd);
+      case AndExpr(:final left, :final right):
+        compile(left);
+        final toEnd = _emitJump(_andJump, -1);
+        compile(right);
+        _emit(_toBool, 0);
+        _patch(toEnd);
+      case NotExpr(:final expr):
+        _compileUnary(expr, Expr.not);
+      case Comparison(:final left, ops: [final op], rights: [final right]):
+        compile(left);
+        compile(right);
+        _emit(_compare, -1, [_indexOf(_compares, op)]);
+      case Comparison():
+        _emit(_eval, 1, [_indexOf(_exprs, node)]);
+      case BitOrExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.or);
+      case BitAndExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.and);
+      case AddExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.add);
+      case SubExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.sub);
+      case MulExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.mul);
+      case DivExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.div);
+      case ModExpr(:final left, :final right):
+        _compileBinary(left, right, Expr.mod);
+      case PosExpr(:final expr):
+        compile(expr);
+      case NegExpr(:final expr):
+        _compileUnary(expr, Expr.neg);
+      case InvertExpr(:final expr):
+        _compileUnary(expr, Expr.invert);
+      case TupleExpr(:final exprs):
+        _compileBuild(_buildTuple, exprs);
+      case ListExpr(:final exprs):
+        _compileBuild(_buildList, exprs);
+      case DictExpr(:final exprs):
+        _compileBuild(_buildDict, exprs);
+      case SetExpr(:final exprs):
+        _compileBuild(_buildSet, exprs);
+      case CodeExpr():
+        // the optimizer compiles only outermost expressions
+        throw StateError('cannot compile already compiled code');
+    }
+  }
+}
@@ -0,0 +1,433 @@
+/// Rewrites Smython ASTs into equivalent ASTs which are cheaper to evaluate.
+///
+/// Supported optimizations:
+/// * Constant folding replaces operations on literals like `(1+2)*3`,
+///   `~5`, `True and False`, or `1 < 4 < 5` with their results, so that
+///   evaluating them later needs just a single [LitExpr].
+/// * Dead code elimination removes statements following a `return`,
+///   `raise`, `break`, or `continue` statement and replaces `if` and
+///   `while` statements with literal conditions by the suite that is
+///   actually evaluated.
+/// * Memoization marks functions as pure if they only compute a result
+///   from their arguments, possibly calling themselves recursively. Calls
+///   of such functions remember their results, so that for example `fib`
+///   needs only a linear number of calls instead of an exponential one.
+/// * Expressions with nested operations are compiled to bytecode (see
+///   `bytecode.dart`) which is run in a single loop instead of recursively
+///   evaluating each node.
+/// * `while` loops which just count a variable up to an integer literal
+///   like `while a < 3: ...; a = a + 1` are replaced by a [RangeLoopStmt]
+///   which neither evaluates the condition nor the increment.
+///
+/// Use [optimize] to apply all optimizations to a freshly parsed [Suite].
+library optimizer;
+
+import 'ast_eval.dart';
+import 'bytecode.dart';
+import 'smython.dart';
+
+/// Returns an optimized version of [suite], see [Optimizer].
+Suite optimize(Suite suite) => const Optimizer().optimizeSuite(suite);
+
+/// Applies optimizations to an AST, returning a new tree and leaving the
+/// original tree untouched. Each optimization can be switched off, for
+/// example to evaluate the raw tree created by the parser.
+final class Optimizer {
+  const Optimizer({
+    this.constantFolding = true,
+    this.deadCodeElimination = true,
+    this.memoization = true,
+    this.bytecode = true,
+    this.rangeLoops = true,
+  });
+
+  /// Whether to replace operations on literals with their results.
+  final bool constantFolding;
+
+  /// Whether to remove statements that are never evaluated.
+  final bool deadCodeElimination;
+
+  /// Whether to memoize the results of pure functions.
+  final bool memoization;
+
+  /// Whether to compile expressions to bytecode.
+  final bool bytecode;
+
+  /// Whether to replace counting `while` loops with [RangeLoopStmt]s.
+  final bool rangeLoops;
+
+  /// Returns the optimized version of [suite].
+  Suite optimizeSuite(Suite suite) {
+    if (!deadCodeElimination) {
+      return Suite([for (final stmt in suite.stmts) optimizeStmt(stmt)]);
+    }
+    final stmts = <Stmt>[];
+    for (var i = 0; i < suite.stmts.length; i++) {
+      final stmt = optimizeStmt(suite.stmts[i]);
+      final branch = _knownBranch(stmt);
+      if (branch != null) {
+        stmts.addAll(branch.stmts);
+        // an `if` statement evaluates to `None`, not to its suite's value
+        if (stmt is IfStmt && i == suite.stmts.length - 1 && !_terminates(stmts.last)) {
+          stmts.add(const PassStmt());
+        }
+      } else {
+        stmts.add(stmt);
+      }
+      if (_terminates(stmts.last)) break;
+    }
+    return Suite(stmts);
+  }
+
+  /// Returns the suite which is evaluated instead of [stmt] if that
+  /// statement's condition is a literal and `null` otherwise.
+  static Suite? _knownBranch(Stmt stmt) {
+    return switch (stmt) {
+      IfStmt(test: LitExpr(:final value), :final thenSuite, :final elseSuite) =>
+        value.boolValue ? thenSuite : elseSuite,
+      WhileStmt(test: LitExpr(:final value), :final elseSuite) when !value.boolValue => elseSuite,
+      _ => null,
+    };
+  }
+
+  /// Returns whether [stmt] never completes normally so that all following
+  /// statements of the same suite are unreachable.
+  static bool _terminates(Stmt stmt) {
+    return stmt is ReturnStmt || stmt is RaiseStmt || stmt is BreakStmt || stmt is ContinueStmt;
+  }
+
+  /// Returns the optimized version of [node].
+  Stmt optimizeStmt(Stmt node) {
+    return switch (node) {
+      IfStmt(:final test, :final thenSuite, :final elseSuite) => IfStmt(
+          _optimizeValue(test),
+          optimizeSuite(thenSuite),
+          optimizeSuite(elseSuite),
+        ),
+      WhileStmt() => _optimizeWhile(node),
+      ForStmt(:final target, :final items, :final suite, :final elseSuite) => ForStmt(
+          _optimizeTarget(target),
+          _optimizeValue(items),
+          optimizeSuite(suite),
+          optimizeSuite(elseSuite),
+        ),
+      TryFinallyStmt(:final suite, :final finallySuite) => TryFinallyStmt(
+          optimizeSuite(suite),
+          optimizeSuite(finallySuite),
+        ),
+      TryExceptStmt(:final trySuite, :final excepts, :final elseSuite) => TryExceptStmt(
+          optimizeSuite(trySuite),
+          [for (final except in excepts) _optimizeExcept(except)],
+          optimizeSuite(elseSuite),
+        ),
+      DefStmt def => DefStmt(
+          def.name,
+          def.params,
+          [for (final expr in def.defs) _optimizeValue(expr)],
+          optimizeSuite(def.suite),
+          pure: def.pure || memoization && _isPure(def),
+        ),
+      ClassStmt(:final name, :final superExpr, :final suite) => ClassStmt(
+          name,
+          _optimizeValue(superExpr),
+          optimizeSuite(suite),
+        ),
+      PassStmt() || BreakStmt() || ContinueStmt() || RangeLoopStmt() => node,
+      ImportNameStmt() || FromImportStmt() || GlobalStmt() => node,
+      ReturnStmt(:final expr) => ReturnStmt(_optimizeValue(expr)),
+      RaiseStmt(:final expr) => RaiseStmt(_optimizeValue(expr)),
+      AssertStmt(:final expr, :final message) => AssertStmt(
+          _optimizeValue(expr),
+          message != null ? _optimizeValue(message) : null,
+        ),
+      ExprStmt(:final expr) => ExprStmt(_optimizeValue(expr)),
+      AssignStmt(:final lhs, :final rhs) => AssignStmt(_optimizeTarget(lhs), _optimizeValue(rhs)),
+      AugAssignStmt aug => _optimizeAugAssign(aug),
+    };
+  }
+
+  /// Returns whether [def] defines a pure function. Its parameters must
+  /// have literal defaults and its body may consist only of `if`, `pass`,
+  /// and `return` statements. Expressions may use only literals, parameters,
+  /// operators, and recursive calls of the function itself.
+  static bool _isPure(DefStmt def) {
+    if (def.params.any((param) => param.startsWith('*')) || def.params.contains(def.name)) return false;
+    if (!def.defs.every((expr) => expr is LitExpr)) return false;
+    return _isPureSuite(def, def.suite);
+  }
+
+  static bool _isPureSuite(DefStmt def, Suite suite) {
+    return suite.stmts.every((stmt) => _isPureStmt(def, stmt));
+  }
+
+  static bool _isPureStmt(DefStmt def, Stmt stmt) {
+    return switch (stmt) {
+      IfStmt(:final test, :final thenSuite, :final elseSuite) =>
+        _isPureExpr(def, test) && _isPureSuite(def, thenSuite) && _isPureSuite(def, elseSuite),
+      ReturnStmt(:final expr) => _isPureExpr(def, expr),
+      PassStmt() => true,
+      _ => false,
+    };
+  }
+
+  static bool _isPureExpr(DefStmt def, Expr node) {
+    return switch (node) {
+      VarExpr(:final name) => def.params.contains(name.value),
+      CallExpr(expr: VarExpr(:final name), :final args) =>
+        name.value == def.name && args.every((arg) => _isPureExpr(def, arg)),
+      CallExpr() || IndexExpr() || AttrExpr() || TupleExpr() || ListExpr() || DictExpr() || SetExpr() => false,
+      _ => _children(node).every((child) => _isPureExpr(def, child)),
+    };
+  }
+
+  /// Returns the direct subexpressions of [node] in evaluation order.
+  static List<Expr> _children(Expr node) {
+    return switch (node) {
+      LitExpr() || VarExpr() => const [],
+      CondExpr(:final test, :final thenExpr, :final elseExpr) => [test, thenExpr, elseExpr],
+      Comparison(:final left, :final rights) => [left, ...rights],
+      OrExpr(:final left, :final right) ||
+      AndExpr(:final left, :final right) ||
+      BitOrExpr(:final left, :final right) ||
+      BitAndExpr(:final left, :final right) ||
+      AddExpr(:final left, :final right) ||
+      SubExpr(:final left, :final right) ||
+      MulExpr(:final left, :final right) ||
+      DivExpr(:final left, :final right) ||
+      ModExpr(:final left, :final right) ||
+      IndexExpr(:final left, :final right) =>
+        [left, right],
+      NotExpr(:final expr) ||
+      PosExpr(:final expr) ||
+      NegExpr(:final expr) ||
+      InvertExpr(:final expr) ||
+      AttrExpr(:final expr) ||
+      CodeExpr(:final expr) =>
+        [expr],
+      CallExpr(:final expr, :final args) => [expr, ...args],
+      TupleExpr(:final exprs) || ListExpr(:final exprs) || DictExpr(:final exprs) || SetExpr(:final exprs) => exprs,
+    };
+  }
+
+  /// Returns the optimized version of the `while` loop [node] which is a
+  /// [RangeLoopStmt] if [node] counts a variable up to an integer literal.
+  Stmt _optimizeWhile(WhileStmt node) {
+    final loop = WhileStmt(_optimizeValue(node.test), optimizeSuite(node.suite), optimizeSuite(node.elseSuite));
+    if (!rangeLoops) return loop;
+    final test = switch (loop.test) { CodeExpr(:final expr) => expr, final expr => expr };
+    final stmts = node.suite.stmts;
+    if (test case Comparison(
+          left: VarExpr(:final name),
+          ops: [final op],
+          rights: [LitExpr(value: SmyNum(value: final int stop))],
+        ) when op == CompOp.lt && stmts.isNotEmpty && _isIncrement(name, stmts.last)) {
+      if (stmts.take(stmts.length - 1).every((stmt) => _isCountingStmt(name, stmt))) {
+        // dead code elimination keeps the increment as last statement
+        final body = loop.suite.stmts;
+        return RangeLoopStmt(name, stop, Suite(body.sublist(0, body.length - 1)), loop.elseSuite, loop);
+      }
+    }
+    return loop;
+  }
+
+  /// Returns whether [stmt] is either `name = name + 1` or `name += 1`.
+  static bool _isIncrement(SmyString name, Stmt stmt) {
+    return switch (stmt) {
+      AssignStmt(
+        lhs: VarExpr(name: final target),
+        rhs: AddExpr(left: VarExpr(name: final source), right: LitExpr(value: SmyNum(value: final int step))),
+      ) =>
+        target == name && source == name && step == 1,
+      AddAssignStmt(lhs: VarExpr(name: final target), rhs: LitExpr(value: SmyNum(value: final int step))) =>
+        target == name && step == 1,
+      _ => false,
+    };
+  }
+
+  /// Returns whether [stmt] can be part of the body of a [RangeLoopStmt]
+  /// counting [name]. It must neither assign [name], nor call functions
+  /// which might assign it, nor leave the loop early.
+  static bool _isCountingStmt(SmyString name, Stmt stmt) {
+    return switch (stmt) {
+      IfStmt(:final test, :final thenSuite, :final elseSuite) => _isCallFree(test) &&
+          thenSuite.stmts.every((stmt) => _isCountingStmt(name, stmt)) &&
+          elseSuite.stmts.every((stmt) => _isCountingStmt(name, stmt)),
+      AssignStmt(:final lhs, :final rhs) || AugAssignStmt(:final lhs, :final rhs) =>
+        !_isAssigned(name, lhs) && _isCallFree(lhs) && _isCallFree(rhs),
+      ExprStmt(:final expr) => _isCallFree(expr),
+      PassStmt() => true,
+      _ => false,
+    };
+  }
+
+  /// Returns whether assigning to [target] binds [name].
+  static bool _isAssigned(SmyString name, Expr target) {
+    return switch (target) {
+      VarExpr(name: final n) => n == name,
+      TupleExpr(:final exprs) => exprs.any((expr) => _isAssigned(name, expr)),
+      _ => false,
+    };
+  }
+
+  /// Returns whether evaluating [node] never calls a function.
+  static bool _isCallFree(Expr node) {
+    return node is! CallExpr && _children(node).every(_isCallFree);
+  }
+
+  ExceptClause _optimizeExcept(ExceptClause node) {
+    final test = node.test;
+    return ExceptClause(test != null ? _optimizeValue(test) : null, node.name, optimizeSuite(node.suite));
+  }
+
+  Stmt _optimizeAugAssign(AugAssignStmt node) {
+    final lhs = _optimizeTarget(node.lhs);
+    final rhs = _optimizeValue(node.rhs);
+    return switch (node) {
+      AddAssignStmt() => AddAssignStmt(lhs, rhs),
+      SubAssignStmt() => SubAssignStmt(lhs, rhs),
+      MulAssignStmt() => MulAssignStmt(lhs, rhs),
+      DivAssignStmt() => DivAssignStmt(lhs, rhs),
+      ModAssignStmt() => ModAssignStmt(lhs, rhs),
+      OrAssignStmt() => OrAssignStmt(lhs, rhs),
+      AndAssignStmt() => AndAssignStmt(lhs, rhs),
+    };
+  }
+
+  /// Returns the optimized version of [node] which is the target of an
+  /// assignment and therefore must stay assignable. Hence, only its
+  /// subexpressions are optimized.
+  Expr _optimizeTarget(Expr node) {
+    return switch (node) {
+      TupleExpr(:final exprs) => TupleExpr([for (final expr in exprs) _optimizeTarget(expr)]),
+      IndexExpr(:final left, :final right) => IndexExpr(_optimizeValue(left), _optimizeValue(right)),
+      AttrExpr(:final expr, :final name) => AttrExpr(_optimizeValue(expr), name),
+      _ => node,
+    };
+  }
+
+  /// Returns the optimized version of [node] which isn't part of another
+  /// expression, compiling it to bytecode if enabled. Single operations on
+  /// literals and names like `n <= 2` or `f(x)` aren't compiled, because
+  /// evaluating their node is cheaper than running bytecode.
+  Expr _optimizeValue(Expr node) {
+    final expr = optimizeExpr(node);
+    if (!bytecode || expr is CodeExpr || _children(expr).every((e) => e is LitExpr || e is VarExpr)) return expr;
+    return CodeExpr(Code.compile(expr), expr);
+  }
+
+  /// Returns the optimized version of [node].
+  Expr optimizeExpr(Expr node) {
+    return switch (node) {
+      CondExpr(:final test, :final thenExpr, :final elseExpr) => _optimizeCond(
+          optimizeExpr(test),
+          optimizeExpr(thenExpr),
+          optimizeExpr(elseExpr),
+        ),
+      OrExpr(:final left, :final right) => _optimizeOr(optimizeExpr(left), optimizeExpr(right)),
+      AndExpr(:final left, :final right) => _optimizeAnd(optimizeExpr(left), optimizeExpr(right)),
+      NotExpr(:final expr) => _optimizeUnary(NotExpr.new, Expr.not, expr),
+      Comparison(:final left, :final ops, :final rights) => _optimizeComparison(left, ops, rights),
+      BitOrExpr(:final left, :final right) => _optimizeBinary(BitOrExpr.new, Expr.or, left, right),
+      BitAndExpr(:final left, :final right) => _optimizeBinary(BitAndExpr.new, Expr.and, left, right),
+      AddExpr(:final left, :final right) => _optimizeBinary(AddExpr.new, Expr.add, left, right),
+      SubExpr(:final left, :final right) => _optimizeBinary(SubExpr.new, Expr.sub, left, right),
+      MulExpr(:final left, :final right) => _optimizeBinary(MulExpr.new, Expr.mul, left, right),
+      DivExpr(:final left, :final right) => _optimizeBinary(DivExpr.new, Expr.div, left, right),
+      ModExpr(:final left, :final right) => _optimizeBinary(ModExpr.new, Expr.mod, left, right),
+      PosExpr(:final expr) => _optimizeUnary(PosExpr.new, (v) => v, expr),
+      NegExpr(:final expr) => _optimizeUnary(NegExpr.new, Expr.neg, expr),
+      InvertExpr(:final expr) => _optimizeUnary(InvertExpr.new, Expr.invert, expr),
+      CallExpr(:final expr, :final args) => CallExpr(
+          optimizeExpr(expr),
+          [for (final arg in args) optimizeExpr(arg)],
+        ),
+      IndexExpr(:final left, :final right) => IndexExpr(optimizeExpr(left), optimizeExpr(right)),
+      AttrExpr(:final expr, :final name) => AttrExpr(optimizeExpr(expr), name),
+      VarExpr() || LitExpr() || CodeExpr() => node,
+      TupleExpr(:final exprs) => _optimizeTuple([for (final expr in exprs) optimizeExpr(expr)]),
+      ListExpr(:final exprs) => ListExpr([for (final expr in exprs) optimizeExpr(expr)]),
+      DictExpr(:final exprs) => DictExpr([for (final expr in exprs) optimizeExpr(expr)]),
+      SetExpr(:final exprs) => SetExpr([for (final expr in exprs) optimizeExpr(expr)]),
+    };
+  }
+
+  Expr _optimizeCond(Expr test, Expr thenExpr, Expr elseExpr) {
+    if (constantFolding && test is LitExpr) {
+      return test.value.boolValue ? thenExpr : elseExpr;
+    }
+    return CondExpr(test, thenExpr, elseExpr);
+  }
+
+  Expr _optimizeOr(Expr left, Expr right) {
+    if (constantFolding && left is LitExpr) {
+      if (left.value.boolValue) return const LitExpr(SmyValue.trueValue);
+      if (right is LitExpr) return LitExpr(SmyBool(right.value.boolValue));
+    }
+    return OrExpr(left, right);
+  }
+
+  Expr _optimizeAnd(Expr left, Expr right) {
+    if (constantFolding && left is LitExpr) {
+      if (!left.value.boolValue) return const LitExpr(SmyValue.falseValue);
+      if (right is LitExpr) return LitExpr(SmyBool(right.value.boolValue));
+    }
+    return AndExpr(left, right);
+  }
+
+  Expr _optimizeUnary(
+    Expr Function(Expr) create,
+    SmyValue Function(SmyValue) op,
+    Expr expr,
+  ) {
+    final e = optimizeExpr(expr);
+    if (e is LitExpr) {
+      final result = _fold(() => op(e.value));
+      if (result != null) return result;
+    }
+    return create(e);
+  }
+
+  Expr _optimizeBinary(
+    Expr Function(Expr, Expr) create,
+    SmyValue Function(SmyValue, SmyValue) op,
+    Expr left,
+    Expr right,
+  ) {
+    final l = optimizeExpr(left);
+    final r = optimizeExpr(right);
+    if (l is LitExpr && r is LitExpr) {
+      final result = _fold(() => op(l.value, r.value));
+      if (result != null) return result;
+    }
+    return create(l, r);
+  }
+
+  Expr _optimizeComparison(Expr left, List<bool Function(SmyValue, SmyValue)> ops, List<Expr> rights) {
+    final l = optimizeExpr(left);
+    final r = [for (final right in rights) optimizeExpr(right)];
+    if (l is LitExpr && r.every((right) => right is LitExpr)) {
+      final result = _fold(() => Comparison.chain(l.value, ops, (i) => (r[i] as LitExpr).value));
+      if (result != null) return result;
+    }
+    return Comparison(l, ops, r);
+  }
+
+  Expr _optimizeTuple(List<Expr> exprs) {
+    if (constantFolding && exprs.every((e) => e is LitExpr)) {
+      return LitExpr(SmyTuple([for (final e in exprs) (e as LitExpr).value]));
+    }
+    return TupleExpr(exprs);
+  }
+
+  /// Returns a literal with the result of [op] or `null` if constant folding
+  /// is disabled or if [op] throws, because that error must then be raised
+  /// when the expression is evaluated.
+  LitExpr? _fold(SmyValue Function() op) {
+    if (!constantFolding) return null;
+    try {
+      return LitExpr(op());
+    } catch (_) {
+      return null;
+    }
+  }
+}
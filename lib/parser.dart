@@ -104,6 +104,10 @@ class Parser {
 
   final Iterator<Token> _iter;
 
+  /// Shared literals for the most common numbers `0` to `256`, so that
+  /// their nodes don't need to be allocated over and over again.
+  static final _smallInts = List<LitExpr>.generate(257, (n) => LitExpr(SmyNum(n)), growable: false);
+
   // -------- Helper --------
 
   /// Returns the current token (not consuming it).
@@ -454,36 +458,34 @@ class Parser {
   /// `comparison: expr {('<'|'>'|'=='|'>='|'<='|'!='|'in'|'not' 'in'|'is' ['not']) expr}`
   Expr parseComparison() {
     final expr = parseExpr();
-    final ops = <CompOp>[];
+    final ops = <bool Function(SmyValue, SmyValue)>[];
+    final rights = <Expr>[];
     while (true) {
       if (at('<')) {
-        ops.add(CompOp(CompOp.lt, parseExpr()));
+        ops.add(CompOp.lt);
       } else if (at('>')) {
-        ops.add(CompOp(CompOp.gt, parseExpr()));
+        ops.add(CompOp.gt);
       } else if (at('==')) {
-        ops.add(CompOp(CompOp.eq, parseExpr()));
+        ops.add(CompOp.eq);
       } else if (at('>=')) {
-        ops.add(CompOp(CompOp.ge, parseExpr()));
+        ops.add(CompOp.ge);
       } else if (at('<=')) {
-        ops.add(CompOp(CompOp.le, parseExpr()));
+        ops.add(CompOp.le);
       } else if (at('!=') || at('<>')) {
-        ops.add(CompOp(CompOp.ne, parseExpr()));
+        ops.add(CompOp.ne);
       } else if (at('in')) {
-        ops.add(CompOp(CompOp.in_, parseExpr()));
+        ops.add(CompOp.in_);
       } else if (at('not')) {
         expect('in');
-        ops.add(CompOp(CompOp.notin, parseExpr()));
+        ops.add(CompOp.notin);
       } else if (at('is')) {
-        if (at('not')) {
-          ops.add(CompOp(CompOp.notis, parseExpr()));
-        } else {
-          ops.add(CompOp(CompOp.is_, parseExpr()));
-        }
+        ops.add(at('not') ? CompOp.notis : CompOp.is_);
       } else {
         break;
       }
+      rights.add(parseExpr());
     }
-    if (ops.isNotEmpty) return Comparison(expr, ops);
+    if (ops.isNotEmpty) return Comparison(expr, ops, rights);
     return expr;
   }
 
@@ -597,7 +599,9 @@ class Parser {
     }
     if (t.isNumber) {
       advance();
-      return LitExpr(SmyNum(t.number));
+      final n = t.number;
+      if (n is int && n < _smallInts.length) return _smallInts[n];
+      return LitExpr(SmyNum(n));
     }
     if (t.isString) {
       final buffer = StringBuffer();
@@ -605,6 +609,7 @@ class Parser {
         buffer.write(token.string);
         advance();
       }
+      if (buffer.isEmpty) return const LitExpr(SmyString(''));
       return LitExpr(SmyString(buffer.toString()));
     }
     throw syntaxError('expected (, [, {, NAME, NUMBER, or STRING');
@@ -1,6 +1,8 @@
 /// Splits Smython source code into tokens.
 library scanner;
 
+import 'dart:typed_data';
+
 import 'token.dart';
 export 'token.dart';
 
@@ -11,6 +13,10 @@ export 'token.dart';
 /// * TABs are not allowed.
 /// * Lines ending with `\` are joined with the next line and mess up
 ///   line numbers in error messages.
+///
+/// This is a handcrafted scanner that looks at each character just once,
+/// using [_classes] to decide what kind of token starts with it.
+/// Characters that cannot start a token are silently skipped.
 Iterable<Token> tokenize(String source) sync* {
   // keep track of indentation
   var curIndent = 0;
@@ -25,49 +31,111 @@ Iterable<Token> tokenize(String source) sync* {
   // assure that the source ends with a newline
   source += '\n';
 
-  // compile the regular expression to tokenize the source
-  final regex = RegExp(
-    '^ *(?:#.*)?\n|#.*\$|(' //       whitespace and comments
-    '^ +|' //                        indentation
-    '\n|' //                         newline
-    '\\d+(?:\\.\\d*)?|' //           numbers
-    '\\w+|' //                       names
-    '[()\\[\\]{}:.,;]|' //           syntax
-    '[+\\-*/%<>=|&]=?|!=|~|' //      operators
-    "'(?:\\\\[n'\"\\\\]|[^'])*'|" // single-quoted strings
-    '"(?:\\\\[n\'"\\\\]|[^"])*"' //  double-quoted strings
-    ')',
-    multiLine: true,
-  );
-
-  for (final match in regex.allMatches(source)) {
-    // did we get a match (empty lines and comments are ignored)?
-    final s = match[1];
-    if (s == null) continue;
-    if (s[0] == ' ') {
-      // compute new indentation which is applied before the next non-whitespace token
-      if (parens == 0) newIndent = s.length ~/ 4;
-    } else {
-      if (s[0] == '\n') {
-        // reset indentation
-        if (parens == 0) newIndent = 0;
-      } else {
-        // found a non-whitespace token, apply new indentation
-        while (curIndent < newIndent) {
-          yield Token.indent;
-          curIndent++;
+  final length = source.length;
+  var lineStart = true;
+  var i = 0;
+  while (i < length) {
+    if (lineStart) {
+      lineStart = false;
+      var j = i;
+      while (source.codeUnitAt(j) == 0x20) {
+        j++;
+      }
+      if (source.codeUnitAt(j) == 0x23) {
+        while (source.codeUnitAt(j) != 0x0a) {
+          j++;
+        }
+      }
+      if (source.codeUnitAt(j) == 0x0a) {
+        // empty lines and comments are ignored
+        lineStart = true;
+        i = j + 1;
+        continue;
+      }
+      if (j > i) {
+        // compute new indentation which is applied before the next non-whitespace token
+        if (parens == 0) newIndent = (j - i) ~/ 4;
+        i = j;
+        continue;
+      }
+    }
+
+    // find the end of the token starting at i
+    final c = source.codeUnitAt(i);
+    var end = i + 1;
+    switch (_classOf(c)) {
+      case _newline:
+        lineStart = true;
+      case _comment:
+        while (source.codeUnitAt(end) != 0x0a) {
+          end++;
+        }
+        i = end;
+        continue;
+      case _digit:
+        while (_classOf(source.codeUnitAt(end)) == _digit) {
+          end++;
+        }
+        if (source.codeUnitAt(end) == 0x2e) {
+          end++;
+          while (_classOf(source.codeUnitAt(end)) == _digit) {
+            end++;
+          }
+        }
+      case _letter:
+        while (_isWord(source.codeUnitAt(end))) {
+          end++;
+        }
+      case _syntax:
+        break;
+      case _operator:
+        if (source.codeUnitAt(end) == 0x3d) end++;
+      case _bang:
+        if (source.codeUnitAt(end) != 0x3d) {
+          i++;
+          continue;
+        }
+        end++;
+      case _quote:
+        // supports \n, \', \", and \\ as escape sequences
+        while (end < length && source.codeUnitAt(end) != c) {
+          end += source.codeUnitAt(end) == 0x5c && end + 1 < length && _isEscape(source.codeUnitAt(end + 1)) ? 2 : 1;
         }
-        while (curIndent > newIndent) {
-          yield Token.dedent;
-          curIndent--;
+        if (end >= length) {
+          // unterminated strings are ignored
+          i++;
+          continue;
         }
+        end++;
+      default:
+        // whitespace and unknown characters are ignored
+        i++;
+        continue;
+    }
+
+    if (c == 0x0a) {
+      // reset indentation
+      if (parens == 0) newIndent = 0;
+    } else {
+      // found a non-whitespace token, apply new indentation
+      while (curIndent < newIndent) {
+        yield Token.indent;
+        curIndent++;
+      }
+      while (curIndent > newIndent) {
+        yield Token.dedent;
+        curIndent--;
       }
-      if (parens > 0 && s == '\n') continue;
-      if (s == '(' || s == '[' || s == '{') parens++;
-      if (s == ')' || s == ']' || s == '}') parens--;
-      // add newline or non-whitespace token to result
-      yield Token(match.input, match.start, match.end);
     }
+    if (parens > 0 && c == 0x0a) {
+      i = end;
+      continue;
+    }
+    if (c == 0x28 || c == 0x5b || c == 0x7b) parens++;
+    if (c == 0x29 || c == 0x5d || c == 0x7d) parens--;
+    // add newline or non-whitespace token to result
+    yield Token(source, i, end);
+    i = end;
   }
 
   // balance pending INDENTs
@@ -79,3 +147,44 @@ Iterable<Token> tokenize(String source) sync* {
   // append EOF
   yield Token.eof;
 }
+
+// character classes
+const _other = 0;
+const _newline = 1;
+const _comment = 2;
+const _digit = 3;
+const _letter = 4;
+const _syntax = 5;
+const _operator = 6;
+const _bang = 7;
+const _quote = 8;
+
+/// Maps ASCII character codes to the class of token they start.
+final _classes = () {
+  final classes = Uint8List(128);
+  void set(String chars, int cls) {
+    for (final c in chars.codeUnits) {
+      classes[c] = cls;
+    }
+  }
+
+  set('\n', _newline);
+  set('#', _comment);
+  set('0123456789', _digit);
+  set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_', _letter);
+  set('()[]{}:.,;~', _syntax);
+  set('+-*/%<>=|&', _operator);
+  set('!', _bang);
+  set('\'"', _quote);
+  return classes;
+}();
+
+int _classOf(int c) => c < 128 ? _classes[c] : _other;
+
+bool _isWord(int c) {
+  final cls = _classOf(c);
+  return cls == _digit || cls == _letter;
+}
+
+/// Returns whether `\` followed by [c] is a valid escape sequence.
+bool _isEscape(int c) => c == 0x6e || c == 0x27 || c == 0x22 || c == 0x5c;
@@ -551,12 +551,55 @@ final class SmyClass extends SmyValue {
   final SmyClass? _superclass;
   final SmyDict _dict = SmyDict({});
 
-  Map<SmyValue, SmyValue> get methods => _dict.values;
+  /// Whether [_dict] has been handed out and might be changed behind our
+  /// back, so that lookups in this class must not be cached anymore.
+  bool _escaped = false;
 
-  SmyValue? findAttr(String name) {
-    final n = SmyString(name);
+  /// Incremented whenever the attributes of some class might have changed,
+  /// which invalidates all [AttrCache]s.
+  static int _version = 0;
+
+  /// The number of class bodies currently being evaluated, which might
+  /// change attributes of their classes at any time.
+  static int _defining = 0;
+
+  Map<SmyValue, SmyValue> get methods {
+    _escape();
+    return _dict.values;
+  }
+
+  /// Evaluates [body] to populate the attributes of this class, passing
+  /// a class frame whose [Frame.locals] are the attributes and whose parent
+  /// is [parent].
+  void define(Frame parent, void Function(Frame f) body) {
+    _defining++;
+    try {
+      body(Frame(parent, _dict.values, parent.globals, parent.builtins, parent.system, isClass: true));
+    } finally {
+      _defining--;
+      _version++;
+    }
+  }
+
+  void _escape() {
+    _escaped = true;
+    _version++;
+  }
+
+  /// Returns whether results of [findAttr] can be cached.
+  bool get _cacheable {
+    if (_defining > 0) return false;
     for (SmyClass? cls = this; cls != null; cls = cls._superclass) {
-      final value = cls._dict.values[n];
+      if (cls._escaped) return false;
+    }
+    return true;
+  }
+
+  SmyValue? findAttr(String name) => _findAttr(SmyString(name));
+
+  SmyValue? _findAttr(SmyString key) {
+    for (SmyClass? cls = this; cls != null; cls = cls._superclass) {
+      final value = cls._dict.values[key];
       if (value != null) return value;
     }
     return null;
@@ -580,7 +623,10 @@ final class SmyClass extends SmyValue {
   SmyValue getAttr(String name) {
     if (name == '__name__') return _name;
     if (name == '__superclass__') return _superclass ?? SmyValue.none;
-    if (name == '__dict__') return _dict;
+    if (name == '__dict__') {
+      _escape();
+      return _dict;
+    }
     final value = _dict.values[SmyString(name)];
     if (value != null) return value;
     return super.getAttr(name);
@@ -588,6 +634,7 @@ final class SmyClass extends SmyValue {
 
   @override
   SmyValue setAttr(String name, SmyValue value) {
+    _version++;
     return _dict.values[SmyString(name)] = value;
   }
 }
@@ -620,12 +667,65 @@ final class SmyObject extends SmyValue {
     return super.getAttr(name);
   }
 
+  /// Like [getAttr] but searches the class hierarchy only if [cache]
+  /// doesn't know the result for this object's class yet.
+  SmyValue _getCachedAttr(AttrCache cache) {
+    // returns a user-defined property
+    final value1 = _dict.values[cache._key];
+    if (value1 != null) return value1;
+    // returns a class property and bind functions as methods
+    SmyValue? value;
+    if (identical(cache._class, _class) && cache._version == SmyClass._version) {
+      value = cache._value;
+    } else {
+      value = _class._findAttr(cache._key);
+      if (value != null && _class._cacheable) {
+        cache._class = _class;
+        cache._value = value;
+        cache._version = SmyClass._version;
+      }
+    }
+    if (value != null) {
+      if (value is SmyFunc) {
+        return SmyMethod(this, value);
+      }
+      return value;
+    }
+    return super.getAttr(cache.name);
+  }
+
   @override
   SmyValue setAttr(String name, SmyValue value) {
     return _dict.values[SmyString(name)] = value;
   }
 }
 
+/// A monomorphic inline cache for getting the attribute [name] of values.
+///
+/// For [SmyObject]s, it remembers the attribute found in the class
+/// hierarchy for the last class seen, so that repeated lookups on instances
+/// of the same class need no search. A cached attribute is valid until some
+/// class is changed.
+final class AttrCache {
+  AttrCache(this.name)
+      : _key = SmyString.intern(name),
+        _special = name == '__class__' || name == '__dict__';
+
+  final String name;
+  final SmyString _key;
+  final bool _special;
+
+  SmyClass? _class;
+  SmyValue? _value;
+  int _version = -1;
+
+  /// Returns the attribute [name] of [receiver], see [SmyValue.getAttr].
+  SmyValue getAttr(SmyValue receiver) {
+    if (receiver is SmyObject && !_special) return receiver._getCachedAttr(this);
+    return receiver.getAttr(name);
+  }
+}
+
 /// instance method
 final class SmyMethod extends SmyValue {
   SmyMethod(this.self, this.func);
@@ -641,7 +741,10 @@ final class SmyMethod extends SmyValue {
 
 /// `def name(param, ...): ...`
 final class SmyFunc extends SmyValue {
-  const SmyFunc(this.df, this.name, this.params, this.defExprs, this.suite);
+  SmyFunc(this.df, this.name, this.params, this.defExprs, this.suite, {bool pure = false})
+      : _names = [for (final param in params) SmyString.intern(param.startsWith('*') ? param.substring(1) : param)],
+        _rest = params.indexWhere((param) => param.startsWith('*')),
+        _memo = pure ? <_Args, SmyValue>{} : null;
 
   final Frame df;
   final SmyString name;
@@ -649,24 +752,84 @@ final class SmyFunc extends SmyValue {
   final List<Expr> defExprs;
   final Suite suite;
 
+  /// The interned [params] (without `*`), computed once and not per call.
+  final List<SmyString> _names;
+
+  /// The index of the `*` parameter in [params] or -1 if there is none.
+  final int _rest;
+
+  /// Results of previous calls of a pure function, least recently used
+  /// first, or `null` if the function isn't known to be pure.
+  final Map<_Args, SmyValue>? _memo;
+
+  /// The maximum number of results remembered in [_memo].
+  static const _memoLimit = 1000;
+
   @override
   String toString() => '<function $name>';
 
   @override
   SmyValue call(Frame cf, List<SmyValue> args) {
+    final memo = _memo;
+    // a pure function might call itself by name, so the memoized results
+    // are only valid as long as that name is still bound to this function
+    if (memo == null ||
+        args.length != params.length ||
+        !args.every(_Args.hashable) ||
+        !identical(df.locals[name], this)) {
+      return _call(args);
+    }
+    final key = _Args(args);
+    final cached = memo.remove(key);
+    if (cached != null) return memo[key] = cached;
+    final result = _call(args);
+    if (_Args.hashable(result)) {
+      memo[key] = result;
+      if (memo.length > _memoLimit) memo.remove(memo.keys.first);
+    }
+    return result;
+  }
+
+  SmyValue _call(List<SmyValue> args) {
     final f = Frame(df, {}, df.globals, df.builtins, df.system);
-    for (var i = 0, j = 0; i < params.length; i++) {
-      final param = params[i];
-      if (param.startsWith('*')) {
-        f.locals[SmyString.intern(param.substring(1))] = SmyTuple(args.sublist(i));
+    final locals = f.locals;
+    for (var i = 0, j = 0; i < _names.length; i++) {
+      if (i == _rest) {
+        locals[_names[i]] = SmyTuple(args.sublist(i));
         break;
       }
-      f.locals[SmyString.intern(param)] = i < args.length ? args[i] : defExprs[j++].evaluate(df);
+      locals[_names[i]] = i < args.length ? args[i] : defExprs[j++].evaluate(df);
     }
     return suite.evaluateAsFunc(f);
   }
 }
 
+/// Arguments of a call, used as key to memoize results of pure functions.
+final class _Args {
+  _Args(this.values);
+
+  final List<SmyValue> values;
+
+  /// Returns whether [value] is immutable and equal values are
+  /// interchangable, so it can be used as part of a key or as a result.
+  /// Doubles are excluded because `1 == 1.0` but both print differently.
+  static bool hashable(SmyValue value) {
+    return value is SmyNone || value is SmyBool || value is SmyString || (value is SmyNum && value.value is int);
+  }
+
+  @override
+  bool operator ==(Object other) {
+    if (other is! _Args || other.values.length != values.length) return false;
+    for (var i = 0; i < values.length; i++) {
+      if (values[i] != other.values[i]) return false;
+    }
+    return true;
+  }
+
+  @override
+  int get hashCode => Object.hashAll(values);
+}
+
 /// Builtin function like `print` or `len`.
 final class SmyBuiltin extends SmyValue {
   const SmyBuiltin(this.name, this.func);
@@ -704,7 +867,7 @@ final class SmyModule extends SmyValue {
 
 /// Runtime state passed to all AST nodes while evaluating them.
 final class Frame {
-  Frame(this.parent, this.locals, this.globals, this.builtins, this.system);
+  Frame(this.parent, this.locals, this.globals, this.builtins, this.system, {this.isClass = false});
 
   /// Links to the parent frame, a.k.a. sender.
   final Frame? parent;
@@ -721,20 +884,28 @@ final class Frame {
   /// Shared reference to the runtime system.
   final Smython system;
 
-  /// Returns the value bound to [name] by first searching [locals],
-  /// then searching [globals], and last but not least searching the
-  /// [builtins]. Throws a `NameError` if [name] is unbound.
+  /// Whether [locals] are the attributes of a class, see [SmyClass.define].
+  /// Functions defined in a class body keep that frame, so assigning a
+  /// name bound there changes the class and must invalidate [AttrCache]s.
+  final bool isClass;
+
+  /// Returns the value bound to [name] by first searching [locals] of
+  /// this and all parent frames, then searching [globals], and last but
+  /// not least searching the [builtins]. Throws a `NameError` if [name]
+  /// is unbound. All frames of a chain share the same [globals] and
+  /// [builtins], so a simple loop suffices.
   SmyValue lookup(SmyString name) {
-    return locals[name] ??
-        parent?.lookup(name) ??
-        globals[name] ??
-        builtins[name] ??
-        (throw "NameError: name '$name' is not defined");
+    for (Frame? f = this; f != null; f = f.parent) {
+      final value = f.locals[name];
+      if (value != null) return value;
+    }
+    return globals[name] ?? builtins[name] ?? (throw "NameError: name '$name' is not defined");
   }
 
   SmyValue set(SmyString name, SmyValue value) {
     for (Frame? f = this; f != null; f = f.parent) {
       if (f.locals.containsKey(name)) {
+        if (f.isClass) SmyClass._version++;
         return f.locals[name] = value;
       }
     }
@@ -13,46 +13,94 @@
 /// output ends with `OK`, there are no failure and everything is shiny.
 library test_runner;
 
+import 'dart:convert';
 import 'dart:io';
+import 'dart:typed_data';
 
+import 'ast_eval.dart' show Suite;
+import 'optimizer.dart';
 import 'smython.dart';
 
+/// Parsed and optimized snippets keyed by their exact source code. Test
+/// suites contain lots of identical snippets like `a=1`, which are shared
+/// so that each snippet is tokenized, parsed, and optimized only once.
+///
+/// Sharing is safe because evaluating a [Suite] never changes its
+/// structure. The only mutable state in its nodes are `AttrCache`s, which
+/// are transparent: a cached attribute is used only for the identical
+/// class and only while the global class version is unchanged, so a cache
+/// filled while running one snippet can't return stale values in another.
+/// [run] still starts with an empty map.
+final _snippets = <String, Suite>{};
+
+/// Returns the [Suite] for [source], parsing it only if not already cached.
+Suite _parse(String source) => _snippets.putIfAbsent(source, () => optimize(parse(source)));
+
+/// Splits the test suite loaded from [filename] into pairs of source code
+/// and the expected result, scanning the file just once.
+///
+/// The file is read as bytes and split into lines without decoding it as
+/// a whole. Prompt lines are collected as views into those bytes and only
+/// each complete snippet and each expected line is decoded into a string.
+List<(String, String)> _load(String filename) {
+  final bytes = File(filename).readAsBytesSync();
+  final tests = <(String, String)>[];
+  final buffer = BytesBuilder(copy: false);
+  var start = 0;
+  while (start < bytes.length) {
+    var end = bytes.indexOf(0x0a, start);
+    if (end == -1) end = bytes.length;
+    final next = end + 1;
+    if (end > start && bytes[end - 1] == 0x0d) end--;
+    if (end > start && bytes[start] != 0x23) {
+      if (_isPrompt(bytes, start, end)) {
+        buffer
+          ..add(Uint8List.sublistView(bytes, start + 4, end))
+          ..addByte(0x0a);
+      } else {
+        tests.add((utf8.decode(buffer.takeBytes()), utf8.decoder.convert(bytes, start, end)));
+      }
+    }
+    start = next;
+  }
+  return tests;
+}
+
+/// Returns whether the line of [bytes] from [start] to [end] starts with
+/// `>>> ` or `... `.
+bool _isPrompt(Uint8List bytes, int start, int end) {
+  if (end - start < 4 || bytes[start + 3] != 0x20) return false;
+  final c = bytes[start];
+  return (c == 0x3e || c == 0x2e) && bytes[start + 1] == c && bytes[start + 2] == c;
+}
+
 /// Runs the Smython test suite loaded from [filename].
 bool run(String filename) {
+  _snippets.clear();
   var failures = 0;
   final report = stdout;
-  final buffer = StringBuffer();
 
-  for (final line in File(filename).readAsLinesSync()) {
-    if (line.isEmpty || line.startsWith('#')) continue;
-    if (line.startsWith('>>> ') || line.startsWith('... ')) {
-      buffer.writeln(line.substring(4));
-    } else {
-      final expected = line;
-      final source = buffer.toString();
-      // report.writeln('----------');
-      // report.write(source);
+  for (final (source, expected) in _load(filename)) {
+    // report.writeln('----------');
+    // report.write(source);
 
-      String actual;
-      try {
-        final system = Smython();
-        final suite = parse(source);
-        final frame = Frame(null, {}, {}, system.builtins, system);
-        actual = repr(suite.evaluate(frame));
-      } catch (e) {
-        actual = '$e';
-      }
-      if (actual == expected) {
-        // report.writeln('OK');
-      } else {
-        report.writeln('----------');
-        report.write(source);
-        report.writeln('Actual..: $actual');
-        report.writeln('Expected: $expected');
-        failures++;
-      }
-
-      buffer.clear();
+    String actual;
+    try {
+      final system = Smython();
+      final suite = _parse(source);
+      final frame = Frame(null, {}, {}, system.builtins, system);
+      actual = repr(suite.evaluate(frame));
+    } catch (e) {
+      actual = '$e';
+    }
+    if (actual == expected) {
+      // report.writeln('OK');
+    } else {
+      report.writeln('----------');
+      report.write(source);
+      report.writeln('Actual..: $actual');
+      report.writeln('Expected: $expected');
+      failures++;
     }
   }
   if (failures > 0) {
@@ -42,6 +42,10 @@ False
 -6
 >>> ~-6
 5
+>>> 1 + 6 / 2 + 4 * 5
+24.0
+>>> 1 < 2 < 3 and not 4 > 5
+True
 
 # parallel assignment
 >>> a, b = 2, 3
@@ -80,6 +84,27 @@ False
 ... a
 2
 
+# counting while loop
+>>> s = 0
+>>> i = 0
+>>> while i < 4:
+...     s += i
+...     i += 1
+... else:
+...     s = -s
+>>> i, s
+(4, -6)
+>>> i = 5
+>>> while i < 4:
+...     i = i + 1
+>>> i
+5
+>>> i = 0.5
+>>> while i < 4:
+...     i = i + 1
+>>> i
+4.5
+
 # for loop
 >>> s = 0
 >>> for i in 1, 2, 3:
@@ -116,6 +141,15 @@ False
 4
 >>> a = 3; a = (1 if a > 2 else 4); a
 1
+>>> if 1: 2
+None
+>>> a = 0
+... while 0:
+...     a = 1
+... else:
+...     a = 2
+... a
+2
 
 # constants
 >>> True, False, None
@@ -287,6 +321,24 @@ True
 >>> c = C(7)
 >>> c.x, c.m()
 (7, 8)
+>>> class A:
+...     def m(self): return 1
+... class B(A): pass
+... def f(o): return o.m
+... b = B()
+... x = f(b)()
+... A.m = 2
+... x, f(b)
+(1, 2)
+>>> class A:
+...     def m(self): return 1
+...     def clear(self): m = 2
+... def f(o): return o.m
+... a = A()
+... x = f(a)()
+... a.clear()
+... x, f(a)
+(1, 2)
 
 # get/set/del
 >>> a = {1: 2}
@@ -310,6 +362,16 @@ True
 >>> fib(20)
 6765
 
+# memoized functions that are rebound
+>>> def g(n):
+...     if n <= 1: return 1
+...     return g(n - 1) + 1
+... h = g
+... x = h(3)
+... def g(n): return 10
+... x, h(3)
+(3, 11)
+
 # syntax errors
 >>> if 1
 SyntaxError: expected : but found NEWLINE at line 1
@@ -1,3 +1,8 @@
+import 'package:smython/ast_eval.dart';
+import 'package:smython/bytecode.dart';
+import 'package:smython/optimizer.dart';
+import 'package:smython/scanner.dart';
+import 'package:smython/smython.dart';
 import 'package:smython/test_runner.dart';
 import 'package:test/test.dart';
 
@@ -5,4 +10,82 @@ void main() {
   test('test runner', () {
     expect(run('parser_tests.py'), isTrue);
   });
+
+  test('tokenize', () {
+    expect(tokenize("if a>=1.5: # c\n\n    b = 'x\\'y' != ~2\n").map((t) => '$t'), [
+      'if', 'a', '>=', '1.5', ':', 'NEWLINE', '!INDENT', //
+      'b', '=', "'x\\'y'", '!=', '~', '2', 'NEWLINE', '!DEDENT', '!EOF',
+    ]);
+  });
+
+  test('constant folding', () {
+    Expr expr(Suite suite) => (suite.stmts.single as ExprStmt).expr;
+
+    final suite = parse('(1+2)*3');
+    expect(expr(optimize(suite)), isA<LitExpr>().having((e) => e.value, 'value', SmyNum(9)));
+    expect(expr(const Optimizer(constantFolding: false, bytecode: false).optimizeSuite(suite)), isA<MulExpr>());
+  });
+
+  test('dead code elimination', () {
+    final suite = optimize(parse('def f():\n    return 1\n    a = 2\nif 0:\n    pass\nelse:\n    a = 3\n'));
+    expect(suite.stmts, [isA<DefStmt>(), isA<AssignStmt>(), isA<PassStmt>()]);
+    expect((suite.stmts[0] as DefStmt).suite.stmts, [isA<ReturnStmt>()]);
+  });
+
+  test('pure functions', () {
+    bool pure(String source) => (optimize(parse(source)).stmts.single as DefStmt).pure;
+
+    expect(pure('def fib(n):\n    if n <= 2: return 1\n    return fib(n - 1) + fib(n - 2)\n'), isTrue);
+    expect(pure('def f(n=1): return -n if n else n % 2\n'), isTrue);
+    expect(pure('def f(n): return n + x\n'), isFalse);
+    expect(pure('def f(n): return len(n)\n'), isFalse);
+    expect(pure('def f(n):\n    a = n\n    return a\n'), isFalse);
+  });
+
+  test('memoization', () {
+    final system = Smython();
+    final frame = Frame(null, {}, {}, system.builtins, system);
+    optimize(parse('def f(n, m): return m + 1\n')).evaluate(frame);
+    final f = frame.lookup(SmyString('f'));
+    SmyValue call(SmyValue n) => f.call(frame, [n, SmyNum(1)]);
+
+    final result = call(SmyNum(0));
+    expect(call(SmyNum(0)), same(result));
+    expect(call(SmyNum(0.5)), isNot(same(call(SmyNum(0.5)))));
+    expect(call(SmyTuple([])), isNot(same(call(SmyTuple([])))));
+    for (var i = 1; i <= 1000; i++) {
+      call(SmyNum(i));
+    }
+    expect(call(SmyNum(0)), isNot(same(result)));
+    expect(call(SmyNum(1000)), same(call(SmyNum(1000))));
+  });
+
+  test('range loops', () {
+    Stmt loop(String source) => optimize(parse(source)).stmts.single;
+
+    expect(loop('while a < 3:\n    a = a + 1\n'), isA<RangeLoopStmt>().having((s) => s.stop, 'stop', 3));
+    expect(loop('while i < 2 * 5:\n    s += i\n    i += 1\n'), isA<RangeLoopStmt>());
+    expect(loop('while a < 3:\n    a = a + 2\n'), isA<WhileStmt>());
+    expect(loop('while a < 3:\n    f()\n    a = a + 1\n'), isA<WhileStmt>());
+    expect(loop('while a < 3:\n    a = 0\n    a = a + 1\n'), isA<WhileStmt>());
+  });
+
+  test('bytecode', () {
+    final system = Smython();
+    final frame = Frame(null, {}, {}, system.builtins, system);
+    String evaluate(String source) {
+      final expr = (parse(source).stmts.single as ExprStmt).expr;
+      return repr(Code.compile(expr).run(frame));
+    }
+
+    expect(evaluate('(1 + 2) * -3'), '-9');
+    expect(evaluate('1 < 3 < 2 or len([1, 2][1:])'), 'True');
+    expect(evaluate('0 < 1 < 2 == 2 > -1'), 'True');
+
+    Expr optimized(String source) => (optimize(parse(source)).stmts.single as ExprStmt).expr;
+    expect(optimized('f(x)'), isA<CallExpr>());
+    expect(optimized('f(x - 1)'), isA<CodeExpr>());
+    expect(evaluate('{1: 2}[1] if not 0 else 3'), '2');
+    expect(evaluate('(1, [2], {3}, 4 > 3 and ~0)'), '(1, [2], {3}, True)');
+  });
 }